@@ -0,0 +1,105 @@
+"""measure memory held by idle tunnels
+
+Open N tunnels through an in-process proxy server to an in-process sink, let
+them go idle and report the traced memory and tasks per tunnel. Figures cover
+every end living in this process: the client side `ClientRemoteProtocol`, the
+proxy side `ProxyServerProtocol` with its upstream connection, and the sink.
+
+Tunnels are measured well within `RELAY_TIMEOUT`, after which idle ones are
+closed.
+"""
+import asyncio
+import gc
+import resource
+import socket
+import tracemalloc
+from struct import pack
+
+import click
+
+from app.client_server import ClientRemoteProtocol
+from app.proxy_server import ProxyServerProtocol
+
+HOST = '127.0.0.1'
+SINK_WRITERS = []
+
+
+async def sink(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """discard everything until EOF"""
+    SINK_WRITERS.append(writer)
+    while await reader.read(4096):
+        pass
+    writer.close()
+
+
+async def open_tunnel(proxy_port: int, sink_port: int) -> ClientRemoteProtocol:
+    """open a tunnel and finish the SOCKS5 handshake"""
+    remote = await ClientRemoteProtocol.create_connection(HOST, proxy_port)
+    await remote.send_block(pack('!BBB', 0x05, 0x01, 0x00))
+    await remote.recv_block()
+    await remote.send_block(
+        pack('!BBBB', 0x05, 0x01, 0x00, 0x01) + socket.inet_aton(HOST) +
+        pack('!H', sink_port))
+    assert await remote.recv_block()
+    return remote
+
+
+def measure() -> int:
+    """traced memory after a full collection"""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def run(n: int, batch: int):
+    """run the measurement"""
+
+    def handle_client(reader, writer):
+        local = ProxyServerProtocol(reader, writer)
+        return asyncio.ensure_future(local.exchange_data())
+
+    sink_server = await asyncio.start_server(sink, host=HOST, port=0)
+    proxy_server = await asyncio.start_server(handle_client,
+                                              host=HOST,
+                                              port=0)
+    sink_port = sink_server.sockets[0].getsockname()[1]
+    proxy_port = proxy_server.sockets[0].getsockname()[1]
+
+    # warm up pools and lazily created state before the baseline
+    tunnels = [await open_tunnel(proxy_port, sink_port)]
+    await asyncio.sleep(0.5)
+    base_memory, base_tasks = measure(), len(asyncio.all_tasks())
+
+    for i in range(0, n, batch):
+        tunnels += await asyncio.gather(*(open_tunnel(proxy_port, sink_port)
+                                          for _ in range(min(batch, n - i))))
+    await asyncio.sleep(1)
+    memory, tasks = measure(), len(asyncio.all_tasks())
+
+    click.echo(f'idle tunnels:       {n}')
+    click.echo(f'bytes per tunnel:   {(memory - base_memory) / n:.0f}')
+    click.echo(f'tasks per tunnel:   {(tasks - base_tasks) / n:.2f}')
+
+    # close both ends so that proxy sessions finish
+    for tunnel in tunnels:
+        await tunnel.close()
+    for writer in SINK_WRITERS:
+        writer.close()
+    await asyncio.sleep(1)
+    proxy_server.close()
+    sink_server.close()
+
+
+@click.command()
+@click.option('-n', '--connections', default=1000, help='number of tunnels')
+@click.option('--batch', default=100, help='tunnels opened concurrently')
+def main(connections: int, batch: int):
+    """report bytes per idle connection"""
+    # each tunnel takes four file descriptors in this process
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    tracemalloc.start()
+    asyncio.run(run(connections, batch))
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,75 @@
+"""check the import time of the `pyagent` CLI
+
+Run `pyagent --help` and `pyagent --version` in fresh interpreters, report
+the cumulative import time of `app.cli` from `-X importtime`, and fail if it
+exceeds the budget or if a heavy module gets imported on these paths.
+"""
+import subprocess
+import sys
+
+import click
+
+# modules only subcommands may load
+HEAVY_MODULES = (
+    'asyncio',
+    'cryptography',
+    'logging.config',
+    'ssl',
+    'app.base_protocol',
+    'app.serv',
+)
+
+SCRIPT = '''
+import sys
+from app.cli import cli
+try:
+    cli([{arg!r}])
+except SystemExit:
+    pass
+print(','.join(sorted(sys.modules)), file=sys.stderr)
+'''
+
+
+def run_cli(arg: str):
+    """run the CLI in a fresh interpreter
+
+    :return: a tuple of 1. import time of `app.cli` in microseconds;
+      2. names of loaded modules
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         SCRIPT.format(arg=arg)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = proc.stderr.splitlines()
+    micros = next(
+        int(line.split('|')[1]) for line in lines
+        if line.startswith('import time:') and line.endswith('| app.cli'))
+    return micros, set(lines[-1].split(','))
+
+
+@click.command()
+@click.option('--budget', default=75.0, help='budget in milliseconds')
+@click.option('--repeat', default=5, help='runs per path, best one counts')
+def main(budget: float, repeat: int):
+    """check the import time budget of `pyagent --help` / `--version`"""
+    failed = False
+    for arg in ('--help', '--version'):
+        results = [run_cli(arg) for _ in range(repeat)]
+        best = min(micros for micros, _ in results) / 1000
+        heavy = [m for m in HEAVY_MODULES if m in results[0][1]]
+        click.echo(f'pyagent {arg}: app.cli imported in {best:.1f} ms '
+                   f'(budget {budget:.1f} ms)')
+        if best > budget:
+            click.echo(f'  over budget by {best - budget:.1f} ms')
+            failed = True
+        if heavy:
+            click.echo(f'  heavy modules imported: {", ".join(heavy)}')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -9,5 +9,3 @@ if env == 'prod':
     cfg = config.Config
 else:
     cfg = config.TestConfig
-
-cfg.configure_logger(__name__)
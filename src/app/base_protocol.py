@@ -4,14 +4,18 @@ from __future__ import annotations
 import asyncio
 import logging
 import socket
+import time
 from functools import wraps
 from struct import unpack
+from typing import Awaitable
+from typing import List
 from typing import NoReturn
 from typing import Optional
 from typing import Tuple
 
 from . import cfg
 from .enigma import AesGcm
+from .replay import ReplayFilter
 
 LOGGER = logging.getLogger(__name__)
 
@@ -32,9 +36,37 @@ def dec(fn):
     return helper
 
 
+class BufferPool:
+    """pool of reusable fixed size buffers"""
+    __slots__ = ['size', 'capacity', '_free']
+
+    _free: List[bytearray]
+
+    def __init__(self, size: int, capacity: int):
+        """initialize an empty pool
+
+        :param size: size of each buffer
+        :param capacity: max number of free buffers to keep
+        """
+        self.size = size
+        self.capacity = capacity
+        self._free = []
+
+    def acquire(self) -> bytearray:
+        """take a free buffer, or allocate one if none left"""
+        if self._free:
+            return self._free.pop()
+        return bytearray(self.size)
+
+    def release(self, buffer: bytearray) -> NoReturn:
+        """give a buffer back"""
+        if len(self._free) < self.capacity:
+            self._free.append(buffer)
+
+
 class BaseTcpProtocol:
     """base TCP protocol"""
-    __slots__ = ['reader', 'writer']
+    __slots__ = ['reader', 'writer', 'stamp']
 
     reader: Optional[asyncio.StreamReader]
     writer: Optional[asyncio.StreamWriter]
@@ -43,6 +75,8 @@ class BaseTcpProtocol:
                  writer: asyncio.StreamWriter):
         self.reader = reader
         self.writer = writer
+        # monotonic time of the last data received
+        self.stamp = time.monotonic()
 
     @staticmethod
     def _inet_aton_int(addr: str) -> int:
@@ -62,6 +96,7 @@ class BaseTcpProtocol:
             return None
         data = await self.reader.read(size)
         if data:
+            self.stamp = time.monotonic()
             return data
         return None
 
@@ -69,6 +104,34 @@ class BaseTcpProtocol:
         """receive data"""
         return await self._recv(size=size)
 
+    @property
+    def buffered(self) -> int:
+        """number of bytes received but not read yet"""
+        if not self.initiated:
+            return 0
+        # relies on a CPython implementation detail: StreamReader has no
+        # public way to peek at its buffer. Without it batching is off, but
+        # relaying still works; `test_buffered` catches such a change.
+        return len(getattr(self.reader, '_buffer', b''))
+
+    async def recv_batch(self,
+                         size: int = 4096,
+                         limit: int = 16) -> Optional[List[bytes]]:
+        """receive data, plus further chunks already buffered
+
+        :param size: max size of each chunk
+        :param limit: max number of chunks
+        :return: a non-empty list of chunks, None if no data available
+        """
+        data = await self._recv(size=size)
+        if data is None:
+            return None
+        batch = [data]
+        # reading buffered data does not wait
+        while len(batch) < limit and self.buffered:
+            batch.append(await self._recv(size=size))
+        return batch
+
     async def recv_any(self,
                        size: int = 4096,
                        times: int = 3,
@@ -111,6 +174,72 @@ class BaseTcpProtocol:
 
         return data
 
+    async def recv_into(self,
+                        view: memoryview,
+                        times: int = 3,
+                        interval: float = 0.5) -> bool:
+        """receive until a writable buffer is filled
+
+        :return: True if filled, False if data non complete
+        """
+        pos, size = 0, len(view)
+        while pos < size:
+            delta = await self.recv_any(size=size - pos,
+                                        times=times,
+                                        interval=interval)
+            if not delta:
+                return False
+            view[pos:pos + len(delta)] = delta
+            pos += len(delta)
+        return True
+
+    @staticmethod
+    async def relay(first: Awaitable, second: Awaitable, timeout: float,
+                    *ends: BaseTcpProtocol) -> NoReturn:
+        """run two relay directions until both finish or timeout
+
+        `first` runs in the calling task and only `second` gets its own task,
+        so a session costs one extra task and no `asyncio.wait` wrappers.
+
+        :param first: first direction
+        :param second: second direction
+        :param timeout: seconds without data received on any of `ends`, or
+          in total if no ends are given
+        :param ends: protocols both directions read from
+        """
+        loop = asyncio.get_running_loop()
+        current = asyncio.current_task()
+        task = loop.create_task(second)
+        timed_out = False
+        start = time.monotonic()
+
+        def on_timeout():
+            nonlocal timer, timed_out
+            # one timer per session, pushed back instead of reset per read
+            idle = time.monotonic() - max((end.stamp for end in ends),
+                                          default=start)
+            if idle < timeout:
+                timer = loop.call_later(timeout - idle, on_timeout)
+                return
+            timed_out = True
+            current.cancel()
+
+        timer = loop.call_later(timeout, on_timeout)
+        try:
+            await first
+            await task
+        except asyncio.CancelledError:
+            if not timed_out:
+                raise
+            LOGGER.debug(f'cancelling task: {task}')
+        except (BrokenPipeError, ConnectionResetError, TimeoutError) as e:
+            LOGGER.debug(e)
+        except Exception as e:  # pylint: disable=broad-except
+            LOGGER.error(f'relay failed: {e!r}')
+        finally:
+            timer.cancel()
+            task.cancel()
+
     async def send(self, data: bytes) -> Optional[int]:
         """send data"""
         if not self.initiated:
@@ -119,6 +248,14 @@ class BaseTcpProtocol:
         await self.writer.drain()
         return len(data)
 
+    async def send_many(self, chunks: List[bytes]) -> Optional[int]:
+        """send chunks with a single write and drain"""
+        if not self.initiated:
+            return None
+        self.writer.writelines(chunks)
+        await self.writer.drain()
+        return sum(len(chunk) for chunk in chunks)
+
     async def close(self) -> NoReturn:
         """safe close"""
         if not self.initiated:
@@ -156,17 +293,69 @@ class BaseTcpProtocol:
 
 class CypherProtocol(BaseTcpProtocol):
     """encrypted protocol"""
+    __slots__ = []
+
     _cypher = AesGcm(key=cfg.CYPHER_KEY, associated=cfg.CYPHER_ASSO)
+    _replay = ReplayFilter(window=cfg.REPLAY_WINDOW,
+                           fp_rate=cfg.REPLAY_FP_RATE,
+                           max_bytes=cfg.REPLAY_MAX_BYTES)
+    _pool = BufferPool(size=AesGcm.FULL_BLOCK_SIZE,
+                       capacity=cfg.BUFFER_POOL_SIZE)
 
     async def send_block(self, data: bytes) -> Optional[int]:
         assert len(data) <= self._cypher.DATA_SIZE
         cypher_block = self._cypher.block_encrypt(data)
         return await super().send(cypher_block)
 
-    async def recv_block(self) -> Optional[bytes]:
-        """receive method"""
-        cypher_block = await self.recv_all(size=self._cypher.FULL_BLOCK_SIZE)
-        if not cypher_block:
+    async def send_blocks(self, payloads: List[bytes]) -> Optional[int]:
+        """encrypt payloads into blocks and send them in one flush"""
+        assert all(len(data) <= self._cypher.DATA_SIZE for data in payloads)
+        return await self.send_many(
+            [self._cypher.block_encrypt(data) for data in payloads])
+
+    async def recv_block(self, check_replay: bool = False) -> Optional[bytes]:
+        """receive method
+
+        :param check_replay: reject the block if its IV has been seen before;
+          only authenticated blocks are recorded
+        :return: decrypted data, None if incomplete or replayed
+        """
+        # wait for the first chunk before taking a buffer, so that idle
+        # connections hold none
+        head = await self.recv_any(size=self._cypher.FULL_BLOCK_SIZE)
+        if not head:
             LOGGER.debug('data non complete, abort')
             return None
-        return self._cypher.block_decrypt(cypher_block)
+        cypher_block = self._pool.acquire()
+        try:
+            view = memoryview(cypher_block)
+            view[:len(head)] = head
+            if not await self.recv_into(view[len(head):]):
+                LOGGER.debug('data non complete, abort')
+                return None
+            data = self._cypher.block_decrypt(cypher_block)
+            iv = bytes(view[:self._cypher.IV_SIZE])
+        finally:
+            self._pool.release(cypher_block)
+        if check_replay and not self._replay.check(iv):
+            LOGGER.warning(f'replayed block from {self.peer}, abort')
+            return None
+        return data
+
+    async def recv_blocks(self, limit: int = 16) -> Optional[List[bytes]]:
+        """receive a block, plus further complete blocks already buffered
+
+        :param limit: max number of blocks
+        :return: a non-empty list of decrypted data, None if incomplete
+        """
+        data = await self.recv_block()
+        if data is None:
+            return None
+        batch = [data]
+        while (len(batch) < limit
+               and self.buffered >= self._cypher.FULL_BLOCK_SIZE):
+            data = await self.recv_block()
+            if data is None:
+                break
+            batch.append(data)
+        return batch
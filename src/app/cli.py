@@ -1,14 +1,79 @@
 """all commands here"""
+from importlib import import_module
+from typing import Dict
+from typing import Tuple
+
 import click
 
-from .serv import run_client
-from .serv import run_server
+from . import cfg
 
+# command name: (import path, short help)
+# subcommands are imported only when invoked, so that `--help` and
+# `--version` do not pay for asyncio, ssl and cryptography
+LAZY_COMMANDS: Dict[str, Tuple[str, str]] = {
+    'loadgen':
+    ('app.loadgen:loadgen', 'generate load through a running client'),
+    'run-client': ('app.serv:run_client', 'run client'),
+    'run-server': ('app.serv:run_server', 'run server'),
+}
 
-@click.group()
-def cli():
-    """all clicks here"""
 
+class LazyGroup(click.Group):
+    """command group loading its subcommands on first use"""
+
+    def __init__(self, *args, lazy_commands: Dict[str, Tuple[str, str]],
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands
+
+    def list_commands(self, ctx: click.Context):
+        return sorted(
+            set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module, attr = self.lazy_commands[cmd_name][0].split(':')
+            self.add_command(getattr(import_module(module), attr), cmd_name)
+        return super().get_command(ctx, cmd_name)
 
-cli.add_command(run_client)
-cli.add_command(run_server)
+    def format_commands(self, ctx: click.Context, formatter):
+        """list commands without importing them"""
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                cmd = self.commands[name]
+                if cmd.hidden:
+                    continue
+                rows.append((name, cmd.get_short_help_str()))
+            else:
+                rows.append((name, self.lazy_commands[name][1]))
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+
+def print_version(ctx: click.Context, _, value: bool):
+    """print the installed package version and exit"""
+    if not value or ctx.resilient_parsing:
+        return
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version
+    try:
+        ver = version('py-agent')
+    except PackageNotFoundError:
+        ver = 'unknown'
+    click.echo(f'pyagent {ver}')
+    ctx.exit()
+
+
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS)
+@click.option('--version',
+              is_flag=True,
+              expose_value=False,
+              is_eager=True,
+              callback=print_version,
+              help='Show the version and exit.')
+def cli():
+    """all clicks here"""
+    cfg.configure_logger(__package__)
@@ -6,15 +6,20 @@ import logging
 from ssl import SSLContext
 from typing import NoReturn
 
+from . import cfg
 from .base_protocol import BaseTcpProtocol
 from .base_protocol import CypherProtocol
+from .sockopt import profile
 
 LOGGER = logging.getLogger(__name__)
 
 
 class ClientRemoteProtocol(CypherProtocol):
     """client remote protocol"""
-    _MAX_TIMEOUT = 30
+    __slots__ = []
+
+    _MAX_TIMEOUT = cfg.RELAY_TIMEOUT
+    _MAX_BATCH = 16
 
     @staticmethod
     async def create_connection(
@@ -28,36 +33,31 @@ class ClientRemoteProtocol(CypherProtocol):
         :param ssl: SSL context for proxy server
         :return:
         """
-        reader, writer = await asyncio.open_connection(host=proxy_host,
+        reader, writer = await profile.open_connection(host=proxy_host,
                                                        port=proxy_port,
-                                                       ssl=ssl)
+                                                       ssl=ssl,
+                                                       fastopen=True)
         return ClientRemoteProtocol(reader, writer)
 
     async def to_local(self, local: BaseTcpProtocol) -> NoReturn:
         """get data and send to local"""
         while not self.closed:
-            data = await self.recv_block()
-            if data is None:
+            batch = await self.recv_blocks(limit=self._MAX_BATCH)
+            if batch is None:
                 break
-            await local.send(data)
+            await local.send_many(batch)
 
     async def from_local(self, local: BaseTcpProtocol) -> NoReturn:
         """get data from local and send"""
         while not self.closed:
-            data = await local.recv()
-            if data is None:
+            batch = await local.recv_batch(size=self._cypher.DATA_SIZE,
+                                           limit=self._MAX_BATCH)
+            if batch is None:
                 break
-            await self.send_block(data)
+            await self.send_blocks(batch)
 
     async def exchange_data(self, local: BaseTcpProtocol):
         """exchange data"""
-        _, pending = await asyncio.wait(
-            [self.from_local(local),
-             self.to_local(local)],
-            timeout=self._MAX_TIMEOUT,
-        )
-        if pending:
-            for p in pending:
-                LOGGER.debug(f'cancelling task: {p}')
-                p.cancel()
+        await self.relay(self.from_local(local), self.to_local(local),
+                         self._MAX_TIMEOUT, self, local)
         await self.close()
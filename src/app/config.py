@@ -1,7 +1,6 @@
 """project config"""
 import os
 import sys
-from logging.config import dictConfig
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 srcdir = os.path.abspath(os.path.join(basedir, os.pardir))
@@ -20,6 +19,36 @@ class Config:
     CYPHER_KEY = b'AAE209EBC7168B13761E92C178CBF566'
     CYPHER_ASSO = b'10C79942B475CF796A5035303E0C5315'
 
+    # replay protection
+    REPLAY_WINDOW = 3600  # seconds a filter generation accepts new nonces
+    REPLAY_FP_RATE = 1e-6
+    REPLAY_MAX_BYTES = 4 * 1024 * 1024
+
+    # seconds a tunnel may go without receiving data before it is closed
+    RELAY_TIMEOUT = 30
+
+    # free cypher block buffers kept for reuse
+    BUFFER_POOL_SIZE = 64
+
+    # bandwidth shaping, in bytes per second, 0 for unlimited
+    RATE_GLOBAL = 0
+    RATE_GLOBAL_BURST = 1024 * 1024
+    RATE_CLIENT = 0
+    RATE_CLIENT_BURST = 256 * 1024
+    RATE_INTERACTIVE = 32 * 1024
+    RATE_INTERACTIVE_BURST = 64 * 1024
+
+    # socket options, 0 for the system default
+    SOCK_NODELAY = True
+    SOCK_FASTOPEN = 256  # fast open queue length, client to proxy leg only
+    SOCK_KEEPALIVE = True
+    SOCK_KEEPIDLE = 60
+    SOCK_KEEPINTVL = 10
+    SOCK_KEEPCNT = 6
+    SOCK_SNDBUF = 0
+    SOCK_RCVBUF = 0
+    SOCK_BACKLOG = 1024
+
     # address
     CLIENT_ADDR = '127.0.0.1'
     CLIENT_PORT = 8888
@@ -35,6 +64,8 @@ class Config:
     @classmethod
     def configure_logger(cls, root_module_name):
         """configure logging"""
+        # pylint: disable=import-outside-toplevel
+        from logging.config import dictConfig
         dictConfig({
             "version": 1,
             "disable_existing_loggers": False,
@@ -4,11 +4,6 @@ from struct import pack
 from struct import unpack
 from typing import NoReturn
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher
-from cryptography.hazmat.primitives.ciphers import algorithms
-from cryptography.hazmat.primitives.ciphers import modes
-
 __all__ = ['AesGcm']
 
 
@@ -25,8 +20,11 @@ class SingletonMeta(type):
 class AesGcm(metaclass=SingletonMeta):
     """AES-GCM cypher class
 
+    The `cryptography` backend is imported on first encryption or
+    decryption, so constructing an instance is cheap.
+
     reference:
-    https://cryptography.io/en/latest/hazmat/primitives/symmetric-encryption/
+    https://cryptography.io/en/latest/hazmat/primitives/aead/
     """
     IV_SIZE = 12
     TAG_SIZE = 16
@@ -34,7 +32,7 @@ class AesGcm(metaclass=SingletonMeta):
     DATA_SIZE = 65535
     FULL_BLOCK_SIZE = IV_SIZE + TAG_SIZE + DATA_LEN_SIZE + DATA_SIZE
 
-    __slots__ = ['key', 'associated']
+    __slots__ = ['key', 'associated', '_aead']
 
     def __init__(self, key: bytes, associated: bytes):
         """initialize an AES-GCM cypher instance
@@ -46,6 +44,7 @@ class AesGcm(metaclass=SingletonMeta):
         """
         self.key = key
         self.associated = associated
+        self._aead = None
 
     @classmethod
     def clear_instance(cls) -> NoReturn:
@@ -55,6 +54,15 @@ class AesGcm(metaclass=SingletonMeta):
         except AttributeError:
             pass
 
+    @property
+    def aead(self):
+        """AES-GCM AEAD cipher, built on first use"""
+        if self._aead is None:
+            # pylint: disable=import-outside-toplevel
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+            self._aead = AESGCM(self.key)
+        return self._aead
+
     def encrypt(self, plaintext: bytes) -> bytes:
         """encrypt plain text bytes
 
@@ -65,21 +73,12 @@ class AesGcm(metaclass=SingletonMeta):
         # Generate a random 96-bit IV.
         iv = os.urandom(12)
 
-        # Construct an AES-GCM Cipher object with the given key and a
-        # randomly generated IV.
-        encryptor = Cipher(algorithms.AES(self.key),
-                           modes.GCM(iv),
-                           backend=default_backend()).encryptor()
-
         # associated_data will be authenticated but not encrypted,
         # it must also be passed in on decryption.
-        encryptor.authenticate_additional_data(self.associated)
+        # GCM does not require padding; the tag is appended to the output.
+        output = self.aead.encrypt(iv, plaintext, self.associated)
 
-        # Encrypt the plaintext and get the associated ciphertext.
-        # GCM does not require padding.
-        cipher_text = encryptor.update(plaintext) + encryptor.finalize()
-
-        return iv, encryptor.tag, cipher_text
+        return iv, output[-self.TAG_SIZE:], output[:-self.TAG_SIZE]
 
     def decrypt(self, iv: bytes, tag: bytes, data: bytes) -> bytes:
         """decrypt cipher text
@@ -89,19 +88,11 @@ class AesGcm(metaclass=SingletonMeta):
         :param data:
         :return:
         """
-        # Construct a Cipher object, with the key, iv, and additionally the
-        # GCM tag used for authenticating the message.
-        decryptor = Cipher(algorithms.AES(self.key),
-                           modes.GCM(iv, tag),
-                           backend=default_backend()).decryptor()
-
-        # We put associated_data back in or the tag will fail to verify
-        # when we finalize the decryptor.
-        decryptor.authenticate_additional_data(self.associated)
-
+        # We put associated_data back in or the tag will fail to verify.
         # Decryption gets us the authenticated plaintext.
         # If the tag does not match an InvalidTag exception will be raised.
-        return decryptor.update(data) + decryptor.finalize()
+        # join copies the data only once, whether bytes or a memoryview
+        return self.aead.decrypt(iv, b''.join((data, tag)), self.associated)
 
     def block_encrypt(self, plaintext: bytes) -> bytes:
         """encrypt plain text into fixed size cypher block
@@ -136,9 +127,12 @@ class AesGcm(metaclass=SingletonMeta):
 
         # check block size
         assert len(cypher_block) == self.FULL_BLOCK_SIZE
-        iv = cypher_block[:12]
-        tag = cypher_block[12:28]
-        data_block = cypher_block[28:]
+        # slice without copying, the block may be a pooled buffer; `decrypt`
+        # then copies the data once, appending the tag
+        view = memoryview(cypher_block)
+        iv = bytes(view[:12])
+        tag = bytes(view[12:28])
+        data_block = view[28:]
         plain_block = self.decrypt(iv, tag, data_block)
         actual_size = unpack('!H', plain_block[:2])[0]
         return plain_block[2:actual_size + 2]
@@ -0,0 +1,306 @@
+"""load generator"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import resource
+import socket
+import time
+from collections import Counter
+from functools import partial
+from struct import pack
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NoReturn
+from typing import Set
+from typing import Tuple
+
+import click
+
+from . import cfg
+
+LOGGER = logging.getLogger(__name__)
+
+# largest payload a session sends in one go, shared by all sessions
+MAX_PAYLOAD = 1024 * 1024
+PAYLOAD = memoryview(bytes(MAX_PAYLOAD))
+
+
+class ProtocolError(Exception):
+    """unexpected SOCKS5 or echo response"""
+
+
+class Distribution(click.ParamType):
+    """random distribution given as `<kind>:<args>`
+
+    * `const:X` or just `X`
+    * `uniform:A:B`
+    * `expo:MEAN`
+    * `lognormal:MU:SIGMA`
+    """
+    name = 'distribution'
+
+    _KINDS: Dict[str, Tuple[int, Callable[..., Callable[[], float]]]] = {
+        'const': (1, lambda x: lambda: x),
+        'uniform': (2, partial(partial, random.uniform)),
+        'expo': (1, lambda mean: partial(random.expovariate, 1 / mean)),
+        'lognormal': (2, partial(partial, random.lognormvariate)),
+    }
+
+    def convert(self, value, param, ctx) -> Callable[[], float]:
+        if callable(value):
+            return value
+        kind, *args = str(value).split(':')
+        if not args:
+            kind, args = 'const', [kind]
+        try:
+            n_args, factory = self._KINDS[kind]
+            assert len(args) == n_args
+            return factory(*map(float, args))
+        except (KeyError, AssertionError, ValueError, ZeroDivisionError):
+            return self.fail(f'{value!r} is not a valid distribution, use one '
+                             f'of: {", ".join(self._KINDS)}')
+
+
+def percentile(values: List[float], q: float) -> float:
+    """nearest-rank percentile, 0 if no values
+
+    :param values: samples
+    :param q: quantile in [0, 1]
+    """
+    if not values:
+        return 0.
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class Stats:
+    """load generator statistics"""
+    __slots__ = [
+        'opened', 'active', 'succeeded', 'failed', 'transferred', 'handshakes',
+        'errors'
+    ]
+
+    def __init__(self):
+        self.opened = 0
+        self.active = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.transferred = 0
+        self.handshakes: List[float] = []
+        self.errors = Counter()
+
+    def report(self, transferred: int, elapsed: float) -> str:
+        """one line summary
+
+        :param transferred: bytes to compute the throughput from
+        :param elapsed: seconds to compute the throughput from
+        """
+        done = self.succeeded + self.failed
+        rate = self.succeeded / done * 100 if done else 0.
+        return (f'opened {self.opened}, active {self.active}, '
+                f'ok {rate:.1f}% of {done}, handshake '
+                f'p50 {percentile(self.handshakes, .5) * 1000:.1f} ms '
+                f'p99 {percentile(self.handshakes, .99) * 1000:.1f} ms, '
+                f'{transferred / elapsed / 1024 / 1024:.2f} MiB/s')
+
+
+async def echo(writers: Set[asyncio.StreamWriter],
+               reader: asyncio.StreamReader,
+               writer: asyncio.StreamWriter) -> NoReturn:
+    """send everything back until EOF"""
+    writers.add(writer)
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writers.discard(writer)
+        writer.close()
+
+
+def socks5_request(host: str, port: int) -> bytes:
+    """SOCKS5 CONNECT request to host and port"""
+    try:
+        addr = pack('!B', 0x01) + socket.inet_aton(host)
+    except OSError:
+        addr = pack('!BB', 0x03, len(host)) + host.encode()
+    return pack('!BBB', 0x05, 0x01, 0x00) + addr + pack('!H', port)
+
+
+async def session(stats: Stats, proxy: Tuple[str, int],
+                  target: Tuple[str, int], payload: Callable[[], float],
+                  duration: Callable[[], float], interval: float,
+                  timeout: float) -> NoReturn:
+    """a single SOCKS5 session exchanging payloads with the echo target"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    stats.opened += 1
+    stats.active += 1
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(*proxy), timeout)
+
+        # greeting and request must not be coalesced, the client relays
+        # each read as its own block
+        writer.write(pack('!BBB', 0x05, 0x01, 0x00))
+        if await asyncio.wait_for(reader.readexactly(2),
+                                  timeout) != b'\x05\x00':
+            raise ProtocolError('greeting rejected')
+        writer.write(socks5_request(*target))
+        reply = await asyncio.wait_for(reader.readexactly(10), timeout)
+        if reply[:2] != b'\x05\x00':
+            raise ProtocolError('connect rejected')
+        stats.handshakes.append(loop.time() - start)
+
+        deadline = loop.time() + duration()
+        while True:
+            size = min(MAX_PAYLOAD, max(1, int(payload())))
+            writer.write(PAYLOAD[:size])
+            await writer.drain()
+            data = await asyncio.wait_for(reader.readexactly(size), timeout)
+            if data != PAYLOAD[:size]:
+                raise ProtocolError('echo mismatch')
+            stats.transferred += size * 2
+            if loop.time() >= deadline:
+                break
+            await asyncio.sleep(interval)
+        stats.succeeded += 1
+    except Exception as e:  # pylint: disable=broad-except
+        LOGGER.debug(f'session failed: {e!r}')
+        stats.failed += 1
+        stats.errors[type(e).__name__] += 1
+    finally:
+        stats.active -= 1
+        if writer is not None:
+            writer.close()
+
+
+async def report_live(stats: Stats, interval: float) -> NoReturn:
+    """print statistics every interval"""
+    last = stats.transferred
+    while True:
+        await asyncio.sleep(interval)
+        click.echo(stats.report(stats.transferred - last, interval))
+        last = stats.transferred
+
+
+async def run(sessions: int, concurrency: int, rate: float,
+              proxy: Tuple[str, int], echo_host: str, echo_port: int,
+              report_interval: float, **kwargs) -> Stats:
+    """open sessions at the given rate and collect statistics"""
+    writers = set()
+    server = await asyncio.start_server(partial(echo, writers),
+                                        host=echo_host,
+                                        port=echo_port)
+    target = echo_host, server.sockets[0].getsockname()[1]
+    click.echo(f'echo target listening on {target}')
+
+    stats = Stats()
+    reporter = asyncio.ensure_future(report_live(stats, report_interval))
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        for i in range(sessions):
+            # schedule by start time, so that slow iterations do not drift
+            delay = start + i / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.ensure_future(
+                session(stats, proxy, target, **kwargs))
+            task.add_done_callback(lambda _: slots.release())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        reporter.cancel()
+        server.close()
+        # upstream connections of the proxy may outlive the sessions
+        for writer in list(writers):
+            writer.close()
+        await asyncio.sleep(0.1)
+    return stats
+
+
+@click.command()
+@click.option('--proxy-host', default=cfg.CLIENT_ADDR, help='run-client host')
+@click.option('--proxy-port', default=cfg.CLIENT_PORT, help='run-client port')
+@click.option('--echo-host',
+              default='127.0.0.1',
+              help='echo target address, must be reachable by run-server')
+@click.option('--echo-port', default=0, help='echo target port, 0 for any')
+@click.option('-n',
+              '--sessions',
+              type=click.IntRange(min=1),
+              default=1000,
+              help='sessions in total')
+@click.option('-c',
+              '--concurrency',
+              type=click.IntRange(min=1),
+              default=1000,
+              help='max concurrent sessions')
+@click.option('-r',
+              '--rate',
+              type=click.FloatRange(min=0, min_open=True),
+              default=100.0,
+              help='sessions opened per second')
+@click.option('--payload',
+              type=Distribution(),
+              default='uniform:64:16384',
+              help='payload size distribution in bytes')
+@click.option('--duration',
+              type=Distribution(),
+              default='expo:5',
+              help='session duration distribution in seconds')
+@click.option('--interval',
+              type=click.FloatRange(min=0),
+              default=0.1,
+              help='seconds between payloads of a session')
+@click.option('--timeout',
+              type=click.FloatRange(min=0, min_open=True),
+              default=10.0,
+              help='seconds to wait for a reply')
+@click.option('--report-interval',
+              type=click.FloatRange(min=0, min_open=True),
+              default=1.0,
+              help='seconds between live reports')
+def loadgen(proxy_host, proxy_port, echo_host, echo_port, sessions,
+            concurrency, rate, payload, duration, interval, timeout,
+            report_interval):
+    """generate load through a running client"""
+    # each session takes three file descriptors in this process
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except ValueError:  # e.g. an infinite hard limit on macOS
+        LOGGER.warning(f'cannot raise the open file limit from {soft}')
+
+    start = time.monotonic()
+    stats = asyncio.run(
+        run(sessions,
+            concurrency,
+            rate, (proxy_host, proxy_port),
+            echo_host,
+            echo_port,
+            report_interval,
+            payload=payload,
+            duration=duration,
+            interval=interval,
+            timeout=timeout))
+    elapsed = time.monotonic() - start
+    click.echo(f'final: {stats.report(stats.transferred, elapsed)}')
+    for name, count in stats.errors.most_common():
+        click.echo(f'  {name}: {count}')
@@ -12,14 +12,25 @@ from typing import Optional
 from . import cfg
 from .base_protocol import BaseTcpProtocol
 from .base_protocol import CypherProtocol
+from .shaping import Flow
+from .shaping import Shaper
+from .sockopt import profile
 
 LOGGER = logging.getLogger(__name__)
 
 
 class ProxyServerProtocol(CypherProtocol):
     """proxy server protocol"""
+    __slots__ = []
 
-    _MAX_TIMEOUT = 30
+    _MAX_TIMEOUT = cfg.RELAY_TIMEOUT
+    _MAX_BATCH = 16
+    _shaper = Shaper(rate=cfg.RATE_GLOBAL,
+                     burst=cfg.RATE_GLOBAL_BURST,
+                     client_rate=cfg.RATE_CLIENT,
+                     client_burst=cfg.RATE_CLIENT_BURST,
+                     interactive_rate=cfg.RATE_INTERACTIVE,
+                     interactive_burst=cfg.RATE_INTERACTIVE_BURST)
 
     async def handshake_socks5(self) -> Optional[BaseTcpProtocol]:
         """handshake handler for socks5 protocol
@@ -27,7 +38,9 @@ class ProxyServerProtocol(CypherProtocol):
         :return: a BaseTcpProtocol instance if handshake successful, None
             otherwise
         """
-        init_req = await self.recv_block()
+        # connection-opening frames must be fresh, or a captured session could
+        # be replayed to make the proxy connect upstream
+        init_req = await self.recv_block(check_replay=True)
         if not init_req:
             LOGGER.info('handshake failed: no data received')
             return
@@ -38,7 +51,10 @@ class ProxyServerProtocol(CypherProtocol):
         await self.send_block(pack('!BB', 0x05, 0x00))
         LOGGER.info(f'try to accept {self.peer} with no auth...')
 
-        conn_req = await self.recv_block()
+        conn_req = await self.recv_block(check_replay=True)
+        if not conn_req:
+            LOGGER.info('handshake failed: no connection request')
+            return
         ver, cmd, _, atype = conn_req[:4]
         assert ver == 0x05 and cmd == 0x01
 
@@ -57,7 +73,7 @@ class ProxyServerProtocol(CypherProtocol):
         port = unpack('!H', conn_req[port_idx:port_idx + 2])[0]
 
         try:
-            reader, writer = await asyncio.open_connection(host=host,
+            reader, writer = await profile.open_connection(host=host,
                                                            port=port)
         except ConnectionRefusedError as e:
             LOGGER.error(f'handshake failed: {e}')
@@ -72,21 +88,26 @@ class ProxyServerProtocol(CypherProtocol):
         LOGGER.info(f'handshake successful with {self.peer}')
         return BaseTcpProtocol(reader, writer)
 
-    async def from_remote(self, remote: BaseTcpProtocol) -> NoReturn:
+    async def from_remote(self, remote: BaseTcpProtocol,
+                          flow: Flow) -> NoReturn:
         """get data from remote and send"""
         while not self.closed:
-            data = await remote.recv()
-            if data is None:
+            batch = await remote.recv_batch(size=self._cypher.DATA_SIZE,
+                                            limit=self._MAX_BATCH)
+            if batch is None:
                 break
-            await self.send_block(data)
+            await flow.throttle(sum(len(data) for data in batch))
+            await self.send_blocks(batch)
 
-    async def to_remote(self, remote: BaseTcpProtocol) -> NoReturn:
+    async def to_remote(self, remote: BaseTcpProtocol,
+                        flow: Flow) -> NoReturn:
         """receive data and send to remote"""
         while not self.closed:
-            data = await self.recv_block()
-            if data is None:
+            batch = await self.recv_blocks(limit=self._MAX_BATCH)
+            if batch is None:
                 break
-            await remote.send(data)
+            await flow.throttle(sum(len(data) for data in batch))
+            await remote.send_many(batch)
 
     async def exchange_data(self) -> None:
         """exchange data"""
@@ -94,17 +115,12 @@ class ProxyServerProtocol(CypherProtocol):
         if not remote:
             await self.close()
             return
+        # both directions of a session share the client's bandwidth
+        flow = self._shaper.flow(self.peer[0])
         # Pipe the streams, execution order is uncertain
-        # can also use 'await asyncio.gather'
-        _, pending = await asyncio.wait(
-            [self.from_remote(remote),
-             self.to_remote(remote)],
-            timeout=self._MAX_TIMEOUT,
-        )
-        if pending:
-            for p in pending:
-                LOGGER.debug(f'cancelling task: {p}')
-                p.cancel()
+        await self.relay(self.from_remote(remote, flow),
+                         self.to_remote(remote, flow), self._MAX_TIMEOUT,
+                         self, remote)
         await remote.close()
         await self.close()
         return
@@ -0,0 +1,149 @@
+"""replay protection"""
+import logging
+import math
+import os
+import time
+from hashlib import blake2b
+from typing import NoReturn
+from typing import Optional
+
+__all__ = ['BloomFilter', 'ReplayFilter']
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """fixed size Bloom filter
+
+    reference:
+    https://en.wikipedia.org/wiki/Bloom_filter#Optimal_number_of_hash_functions
+    """
+    __slots__ = ['n_bits', 'n_hashes', 'capacity', 'count', '_bits', '_salt']
+
+    def __init__(self, capacity: int, fp_rate: float):
+        """initialize an empty Bloom filter
+
+        :param capacity: expected number of items to hold
+        :param fp_rate: false-positive rate when `capacity` items are added
+        """
+        assert capacity > 0 and 0 < fp_rate < 1
+        self.n_bits = self.optimal_bits(capacity, fp_rate)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.n_bits + 7) // 8)
+        # per-instance key, so bit positions cannot be predicted by a peer
+        self._salt = os.urandom(16)
+
+    @staticmethod
+    def optimal_bits(capacity: int, fp_rate: float) -> int:
+        """number of bits needed to hold `capacity` items at `fp_rate`"""
+        return max(8,
+                   math.ceil(-capacity * math.log(fp_rate) / math.log(2)**2))
+
+    @staticmethod
+    def optimal_capacity(n_bits: int, fp_rate: float) -> int:
+        """number of items `n_bits` bits can hold at `fp_rate`"""
+        return max(1, int(-n_bits * math.log(2)**2 / math.log(fp_rate)))
+
+    @property
+    def full(self) -> bool:
+        """whether the filter holds its planned capacity"""
+        return self.count >= self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        """memory used by the bit array"""
+        return len(self._bits)
+
+    def _indexes(self, item: bytes):
+        # double hashing: g_i(x) = h1(x) + i * h2(x)
+        digest = blake2b(item, digest_size=16, key=self._salt).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self._bits[i >> 3] & (1 << (i & 7))
+                   for i in self._indexes(item))
+
+    def add(self, item: bytes) -> bool:
+        """add an item
+
+        :param item: bytes to add
+        :return: True if the item was (probably) present already
+        """
+        present = True
+        for i in self._indexes(item):
+            mask = 1 << (i & 7)
+            if not self._bits[i >> 3] & mask:
+                present = False
+                self._bits[i >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+
+class ReplayFilter:
+    """time-rotating Bloom filters of seen nonces
+
+    Two generations are kept: the current one receives new nonces, the
+    previous one is only consulted. A generation is retired once it is older
+    than `window` seconds, so a nonce is remembered for at least one full
+    window.
+
+    The memory cap takes priority: a generation is also retired once it holds
+    its capacity, and nonces are then forgotten before the window ends. Such
+    early rotations are logged as warnings; raise `max_bytes` if they occur.
+    """
+    __slots__ = ['window', 'fp_rate', 'capacity', '_current', '_previous',
+                 '_since']
+
+    def __init__(self,
+                 window: float = 3600,
+                 fp_rate: float = 1e-6,
+                 max_bytes: int = 4 * 1024 * 1024):
+        """initialize a replay filter
+
+        :param window: seconds each generation accepts new nonces
+        :param fp_rate: false-positive rate of a full generation
+        :param max_bytes: memory cap for both generations together
+        """
+        self.window = window
+        self.fp_rate = fp_rate
+        self.capacity = BloomFilter.optimal_capacity(max_bytes * 8 // 2,
+                                                     fp_rate)
+        # allocated on first check
+        self._current: Optional[BloomFilter] = None
+        self._previous: Optional[BloomFilter] = None
+        self._since = time.monotonic()
+
+    def _rotate(self) -> NoReturn:
+        self._previous = self._current
+        self._current = BloomFilter(self.capacity, self.fp_rate)
+        self._since = time.monotonic()
+
+    def check(self, nonce: bytes) -> bool:
+        """check a nonce and remember it
+
+        :param nonce: frame IV / nonce
+        :return: True if the nonce is fresh, False if it was seen before
+        """
+        if self._current is None:
+            self.clear()
+        elif time.monotonic() - self._since > self.window:
+            self._rotate()
+        elif self._current.full:
+            elapsed = time.monotonic() - self._since
+            LOGGER.warning(f'replay filter full after {elapsed:.0f}s of a '
+                           f'{self.window}s window, rotating early')
+            self._rotate()
+        if self._previous is not None and nonce in self._previous:
+            return False
+        return not self._current.add(nonce)
+
+    def clear(self) -> NoReturn:
+        """forget all nonces"""
+        self._current = BloomFilter(self.capacity, self.fp_rate)
+        self._previous = None
+        self._since = time.monotonic()
@@ -8,6 +8,7 @@ from . import cfg
 from .base_protocol import BaseTcpProtocol
 from .client_server import ClientRemoteProtocol
 from .proxy_server import ProxyServerProtocol
+from .sockopt import profile
 
 LOGGER = logging.getLogger(__name__)
 
@@ -17,13 +18,19 @@ def run_client():
     """run client"""
 
     async def handle_client(reader, writer):
+        profile.apply_writer(writer)
         local = BaseTcpProtocol(reader, writer)
         remote = await ClientRemoteProtocol.create_connection(
             cfg.REMOTE_HOST_ADDR, cfg.HOST_PORT)
         return asyncio.ensure_future(remote.exchange_data(local))
 
     async def service(h: str = cfg.CLIENT_ADDR, p: int = cfg.CLIENT_PORT):
-        return await asyncio.start_server(handle_client, host=h, port=p)
+        server = await asyncio.start_server(handle_client,
+                                            host=h,
+                                            port=p,
+                                            backlog=profile.backlog)
+        profile.apply_listener(server)
+        return server
 
     loop = asyncio.get_event_loop()
     server = loop.run_until_complete(service())
@@ -43,17 +50,21 @@ def run_server():
     """run server"""
 
     def handle_client(reader, writer):
+        profile.apply_writer(writer)
         local = ProxyServerProtocol(reader, writer)
         LOGGER.info(f'new client from: {local.peer}')
         return asyncio.ensure_future(local.exchange_data())
 
     async def service(h: str = cfg.HOST_ADDR, p: int = cfg.HOST_PORT):
-        return await asyncio.start_server(
+        server = await asyncio.start_server(
             handle_client,
             host=h,
             port=p,
             ssl=None,
+            backlog=profile.backlog,
         )
+        profile.apply_listener(server, fastopen=True)
+        return server
 
     loop = asyncio.get_event_loop()
     server = loop.run_until_complete(service())
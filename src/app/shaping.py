@@ -0,0 +1,258 @@
+"""bandwidth shaping"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import NoReturn
+from typing import Optional
+from typing import Tuple
+
+__all__ = ['TokenBucket', 'Shaper', 'Flow']
+
+
+class TokenBucket:
+    """token bucket of bytes
+
+    Tokens may go into debt: a consumer is charged immediately and then waits
+    until the whole debt is paid back, so payloads larger than the burst size
+    still pass. A non-positive rate disables the bucket.
+    """
+    __slots__ = ['rate', 'burst', 'tokens', 'stamp']
+
+    def __init__(self, rate: float, burst: float):
+        """initialize a full bucket
+
+        :param rate: refill rate in bytes per second
+        :param burst: bucket size in bytes
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        """bucket disabled or not"""
+        return self.rate <= 0
+
+    @property
+    def full(self) -> bool:
+        """refilled up to the burst size, i.e. as good as a new bucket"""
+        if self.unlimited:
+            return True
+        self._refill()
+        return self.tokens >= self.burst
+
+    def _refill(self) -> NoReturn:
+        now = time.monotonic()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, size: int) -> bool:
+        """take tokens only if available, never going into debt
+
+        :param size: number of bytes
+        :return: True if taken
+        """
+        if self.unlimited:
+            return True
+        self._refill()
+        if self.tokens < size:
+            return False
+        self.tokens -= size
+        return True
+
+    async def consume(self, size: int, wait: bool = True) -> NoReturn:
+        """charge tokens and wait for any resulting debt
+
+        :param size: number of bytes
+        :param wait: whether to wait for the debt to be paid back
+        """
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens -= size
+        # charges made while sleeping, e.g. without waiting, extend the wait
+        while wait and self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+            self._refill()
+
+
+class Flow:
+    """shaping state of a single stream"""
+    __slots__ = [
+        '_shaper', '_client', '_allowance', '_interactive', 'deficit',
+        'pending', 'queued'
+    ]
+
+    pending: Deque[Tuple[int, asyncio.Future]]
+
+    def __init__(self, shaper: 'Shaper', client: TokenBucket,
+                 allowance: TokenBucket):
+        self._shaper = shaper
+        self._client = client
+        self._allowance = allowance
+        self._interactive = TokenBucket(shaper.interactive_rate,
+                                        shaper.interactive_burst)
+        # deficit round-robin state, see `Shaper._dispatch`
+        self.deficit = 0
+        self.pending = deque()
+        self.queued = False
+
+    async def throttle(self, size: int) -> NoReturn:
+        """wait until `size` bytes may be relayed
+
+        A stream staying within the interactive rate is charged to its client
+        and the global bucket without waiting, so it keeps a low latency even
+        behind bulk streams of the same client. Such charges also come out of
+        the client's interactive allowance, which all its streams share, so
+        opening more streams does not get a client past its rate. Other
+        streams wait for their client's bucket, then for their fair share of
+        the global one.
+        """
+        if self._interactive_take(size):
+            await self._client.consume(size, wait=False)
+            await self._shaper.bucket.consume(size, wait=False)
+            return
+        await self._client.consume(size)
+        await self._shaper.schedule(self, size)
+
+    def _interactive_take(self, size: int) -> bool:
+        if self._shaper.interactive_rate <= 0:
+            return False
+        if not self._interactive.take(size):
+            return False
+        if not self._allowance.take(size):
+            self._interactive.tokens += size
+            return False
+        return True
+
+
+class Shaper:
+    """global and per-client bandwidth shaper
+
+    The global bucket is shared between bulk streams by deficit round-robin
+    (DRR): each round a stream with pending data earns `quantum` bytes of
+    credit and is served once its credit covers its next charge. Streams get
+    an equal share of bytes however they size their charges.
+
+    reference:
+    https://en.wikipedia.org/wiki/Deficit_round_robin
+    """
+    __slots__ = [
+        'bucket', 'quantum', 'client_rate', 'client_burst', 'max_clients',
+        'interactive_rate', 'interactive_burst', '_clients', '_active',
+        '_dispatcher'
+    ]
+
+    _clients: Dict[str, Tuple[TokenBucket, TokenBucket]]
+    _active: Deque[Flow]
+
+    def __init__(self,
+                 rate: float = 0,
+                 burst: float = 0,
+                 client_rate: float = 0,
+                 client_burst: float = 0,
+                 interactive_rate: float = 0,
+                 interactive_burst: float = 0,
+                 quantum: int = 16 * 1024,
+                 max_clients: int = 10000):
+        """initialize a shaper, non-positive rates disable the limit
+
+        :param rate: global rate in bytes per second
+        :param burst: global bucket size in bytes
+        :param client_rate: rate of each client
+        :param client_burst: bucket size of each client
+        :param interactive_rate: per-stream rate below which a stream is
+          treated as interactive, also the interactive allowance of each
+          client, non-positive to treat none as interactive
+        :param interactive_burst: interactive bucket size
+        :param quantum: bytes of credit a bulk stream earns per round
+        :param max_clients: number of client buckets above which refilled
+          ones are dropped
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.quantum = quantum
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.interactive_rate = interactive_rate
+        self.interactive_burst = interactive_burst
+        # client buckets outlive their flows until refilled, so reconnecting
+        # does not clear a debt
+        self._clients = {}
+        self._active = deque()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _client(self, client: str) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._clients.get(client)
+        if buckets is not None:
+            return buckets
+        if len(self._clients) >= self.max_clients:
+            # refilled buckets are as good as new ones
+            self._clients = {
+                k: v
+                for k, v in self._clients.items()
+                if not (v[0].full and v[1].full)
+            }
+        allowance = self.interactive_rate
+        if self.client_rate > 0:
+            allowance = min(allowance, self.client_rate)
+        buckets = (TokenBucket(self.client_rate, self.client_burst),
+                   TokenBucket(allowance, self.interactive_burst))
+        if not (buckets[0].unlimited and buckets[1].unlimited):
+            self._clients[client] = buckets
+        return buckets
+
+    def flow(self, client: str) -> Flow:
+        """create a flow for a new stream
+
+        :param client: client identity, e.g. source IP address
+        """
+        return Flow(self, *self._client(client))
+
+    async def schedule(self, flow: Flow, size: int) -> NoReturn:
+        """wait for the fair share of the global bucket
+
+        :param flow: stream to charge
+        :param size: number of bytes
+        """
+        if self.bucket.unlimited:
+            return
+        future = asyncio.get_running_loop().create_future()
+        flow.pending.append((size, future))
+        if not flow.queued:
+            flow.queued = True
+            self._active.append(flow)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> NoReturn:
+        """grant pending charges in deficit round-robin order"""
+        while self._active:
+            # the flow stays queued while served, so that the state is
+            # consistent should the dispatcher be cancelled
+            flow = self._active[0]
+            flow.deficit += self.quantum
+            while flow.pending:
+                size, future = flow.pending[0]
+                if future.done():  # waiter cancelled
+                    flow.pending.popleft()
+                    continue
+                if size > flow.deficit:
+                    break
+                flow.pending.popleft()
+                flow.deficit -= size
+                future.set_result(None)
+                # wait until the grant is paid for, which also lets the
+                # stream queue its next charge before its turn is over
+                await self.bucket.consume(size)
+            self._active.popleft()
+            if flow.pending:
+                self._active.append(flow)
+            else:
+                flow.deficit = 0
+                flow.queued = False
@@ -0,0 +1,187 @@
+"""socket options"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+import sys
+from ssl import SSLContext
+from typing import NoReturn
+from typing import Optional
+from typing import Tuple
+
+from . import cfg
+
+__all__ = ['SocketProfile', 'profile']
+
+LOGGER = logging.getLogger(__name__)
+
+# Linux only, and not exposed by the socket module
+TCP_FASTOPEN_CONNECT = 30 if sys.platform.startswith('linux') else None
+
+
+class SocketProfile:
+    """socket options applied to listening, proxy and upstream sockets
+
+    A falsy value leaves the system default in place.
+    """
+    __slots__ = [
+        'nodelay', 'fastopen', 'keepalive', 'keepidle', 'keepintvl',
+        'keepcnt', 'sndbuf', 'rcvbuf', 'backlog'
+    ]
+
+    def __init__(self,
+                 nodelay: bool = True,
+                 fastopen: int = 0,
+                 keepalive: bool = False,
+                 keepidle: int = 0,
+                 keepintvl: int = 0,
+                 keepcnt: int = 0,
+                 sndbuf: int = 0,
+                 rcvbuf: int = 0,
+                 backlog: int = 100):
+        """initialize a profile
+
+        :param nodelay: disable Nagle's algorithm
+        :param fastopen: TCP Fast Open queue length of the proxy listener;
+          also enables Fast Open on the client to proxy connection
+        :param keepalive: enable TCP keepalive
+        :param keepidle: idle seconds before the first keepalive probe
+        :param keepintvl: seconds between keepalive probes
+        :param keepcnt: failed probes before a peer is considered dead
+        :param sndbuf: SO_SNDBUF in bytes
+        :param rcvbuf: SO_RCVBUF in bytes
+        :param backlog: listen backlog
+        """
+        self.nodelay = nodelay
+        self.fastopen = fastopen
+        self.keepalive = keepalive
+        self.keepidle = keepidle
+        self.keepintvl = keepintvl
+        self.keepcnt = keepcnt
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+        self.backlog = backlog
+
+    @staticmethod
+    def _set(sock: socket.socket, level: int, name: Optional[int],
+             value: int) -> NoReturn:
+        if name is None:
+            return
+        try:
+            sock.setsockopt(level, name, value)
+        except OSError as e:
+            LOGGER.debug(f'setsockopt {name} failed: {e}')
+
+    def _apply_buffers(self, sock: socket.socket) -> NoReturn:
+        if self.sndbuf:
+            self._set(sock, socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        if self.rcvbuf:
+            self._set(sock, socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+    def apply(self, sock: socket.socket) -> NoReturn:
+        """apply options to a connected TCP socket"""
+        if sock is None or sock.family not in (socket.AF_INET,
+                                               socket.AF_INET6):
+            return
+        self._set(sock, socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                  int(self.nodelay))
+        self._apply_buffers(sock)
+        if not self.keepalive:
+            return
+        self._set(sock, socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if self.keepidle:
+            # macOS names it TCP_KEEPALIVE
+            self._set(
+                sock, socket.IPPROTO_TCP,
+                getattr(socket, 'TCP_KEEPIDLE',
+                        getattr(socket, 'TCP_KEEPALIVE', None)), self.keepidle)
+        if self.keepintvl:
+            self._set(sock, socket.IPPROTO_TCP,
+                      getattr(socket, 'TCP_KEEPINTVL', None), self.keepintvl)
+        if self.keepcnt:
+            self._set(sock, socket.IPPROTO_TCP,
+                      getattr(socket, 'TCP_KEEPCNT', None), self.keepcnt)
+
+    def apply_writer(self, writer: asyncio.StreamWriter) -> NoReturn:
+        """apply options to the socket of a stream writer"""
+        self.apply(writer.get_extra_info('socket'))
+
+    def apply_listener(self,
+                       server: asyncio.AbstractServer,
+                       fastopen: bool = False) -> NoReturn:
+        """apply options to listening sockets
+
+        Buffer sizes are set on the listener so that accepted sockets
+        advertise a matching TCP window scale during the handshake.
+
+        :param server: a started server
+        :param fastopen: accept TCP Fast Open connections
+        """
+        for sock in server.sockets:
+            self._apply_buffers(sock)
+            if fastopen and self.fastopen:
+                self._set(sock, socket.IPPROTO_TCP,
+                          getattr(socket, 'TCP_FASTOPEN', None), self.fastopen)
+
+    async def open_connection(
+        self,
+        host: str,
+        port: int,
+        ssl: Optional[SSLContext] = None,
+        fastopen: bool = False,
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """open a tuned TCP connection
+
+        :param host: host name
+        :param port: port
+        :param ssl: optional SSL context
+        :param fastopen: send the first data with the SYN via TCP Fast Open
+        :return: a tuple of 1. stream reader; 2. stream writer
+        """
+        if not (fastopen and self.fastopen):
+            reader, writer = await asyncio.open_connection(host=host,
+                                                           port=port,
+                                                           ssl=ssl)
+            self.apply_writer(writer)
+            return reader, writer
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host,
+                                       port,
+                                       type=socket.SOCK_STREAM,
+                                       proto=socket.IPPROTO_TCP)
+        # try each address in turn like `asyncio.open_connection`, e.g. an
+        # IPv6 address first on an IPv4-only host
+        error: Optional[OSError] = None
+        for family, type_, proto, _, addr in infos:
+            sock = None
+            try:
+                sock = socket.socket(family, type_, proto)
+                sock.setblocking(False)
+                # options must be set before connect to affect the handshake
+                self.apply(sock)
+                self._set(sock, socket.IPPROTO_TCP, TCP_FASTOPEN_CONNECT, 1)
+                await loop.sock_connect(sock, addr)
+            except OSError as e:
+                if sock is not None:
+                    sock.close()
+                error = e
+                continue
+            except BaseException:
+                if sock is not None:
+                    sock.close()
+                raise
+            return await asyncio.open_connection(
+                sock=sock, ssl=ssl, server_hostname=host if ssl else None)
+        raise error or OSError(f'no address found for {host}:{port}')
+
+profile = SocketProfile(nodelay=cfg.SOCK_NODELAY,
+                        fastopen=cfg.SOCK_FASTOPEN,
+                        keepalive=cfg.SOCK_KEEPALIVE,
+                        keepidle=cfg.SOCK_KEEPIDLE,
+                        keepintvl=cfg.SOCK_KEEPINTVL,
+                        keepcnt=cfg.SOCK_KEEPCNT,
+                        sndbuf=cfg.SOCK_SNDBUF,
+                        rcvbuf=cfg.SOCK_RCVBUF,
+                        backlog=cfg.SOCK_BACKLOG)
@@ -0,0 +1,37 @@
+"""shared test helpers"""
+import asyncio
+import functools
+
+
+class FakeWriter:
+    """stream writer recording writes and drains"""
+
+    def __init__(self, peername=('127.0.0.1', 40000)):
+        self.writes = []
+        self.drains = 0
+        self.peername = peername
+
+    def write(self, data: bytes):
+        self.writes.append(bytes(data))
+
+    def writelines(self, chunks):
+        self.write(b''.join(chunks))
+
+    async def drain(self):
+        self.drains += 1
+
+    def is_closing(self):
+        return False
+
+    def get_extra_info(self, name: str, default=None):
+        return {'peername': self.peername}.get(name, default)
+
+
+def async_test(func):
+    """run a coroutine test method in a fresh event loop"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(func(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,124 @@
+"""test base protocols"""
+import asyncio
+import time
+import unittest
+
+from app.base_protocol import BaseTcpProtocol
+from app.base_protocol import BufferPool
+from app.base_protocol import CypherProtocol
+from tests import FakeWriter
+from tests import async_test
+
+
+class TestBaseProtocol(unittest.TestCase):
+    """test base protocol helpers"""
+
+    def test_buffer_pool(self):
+        """test buffer pool"""
+        pool = BufferPool(size=16, capacity=1)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(16, len(first))
+        self.assertIsNot(first, second)
+        pool.release(first)
+        pool.release(second)
+        self.assertIs(first, pool.acquire())
+        self.assertIsNot(second, pool.acquire())
+
+    def test_relay(self):
+        """test relay of two directions"""
+        done = []
+
+        async def direction(name: str, delay: float):
+            await asyncio.sleep(delay)
+            done.append(name)
+
+        async def run(timeout: float):
+            await BaseTcpProtocol.relay(direction('first', 0.01),
+                                        direction('second', 0.02), timeout)
+            # let cancelled tasks finish
+            await asyncio.sleep(0)
+            return len(asyncio.all_tasks())
+
+        self.assertEqual(1, asyncio.run(run(1)))
+        self.assertEqual(['first', 'second'], done)
+
+        # both directions are cancelled on timeout
+        done.clear()
+        self.assertEqual(1, asyncio.run(run(0.005)))
+        self.assertEqual([], done)
+
+    @async_test
+    async def test_relay_idle(self):
+        """test relay times out on idle ends only, and logs failures"""
+        reader = asyncio.StreamReader()
+        end = BaseTcpProtocol(reader, FakeWriter())
+
+        async def feed():
+            for _ in range(4):
+                await asyncio.sleep(0.02)
+                reader.feed_data(b'x')
+            reader.feed_eof()
+
+        async def drain():
+            while await end.recv_batch():
+                pass
+
+        start = time.monotonic()
+        await BaseTcpProtocol.relay(feed(), drain(), 0.03, end)
+        # active for longer than the timeout, and finished without it
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+        self.assertTrue(reader.at_eof())
+
+        async def fail():
+            raise ValueError('bad frame')
+
+        with self.assertLogs('app.base_protocol', 'ERROR'):
+            await BaseTcpProtocol.relay(fail(), asyncio.sleep(0), 1)
+
+    @async_test
+    async def test_buffered(self):
+        """test buffered bytes are seen through the private reader buffer"""
+        reader = asyncio.StreamReader()
+        self.assertTrue(hasattr(reader, '_buffer'),
+                        'StreamReader._buffer is gone, batching is off')
+        proto = BaseTcpProtocol(reader, FakeWriter())
+        reader.feed_data(b'abcdefghij')
+        self.assertEqual(10, proto.buffered)
+        await proto.recv_batch(4, 1)
+        self.assertEqual(6, proto.buffered)
+
+    @async_test
+    async def test_batch(self):
+        """test batched receive and send"""
+        reader = asyncio.StreamReader()
+        writer = FakeWriter()
+        reader.feed_data(b'abcdefghij')
+        proto = BaseTcpProtocol(reader, writer)
+        self.assertEqual([b'abcd', b'efgh'], await proto.recv_batch(4, 2))
+        self.assertEqual([b'ij'], await proto.recv_batch(4, 2))
+        reader.feed_eof()
+        self.assertIsNone(await proto.recv_batch(4, 2))
+
+        self.assertEqual(4, await proto.send_many([b'ab', b'cd']))
+        self.assertEqual(([b'abcd'], 1), (writer.writes, writer.drains))
+
+    @async_test
+    async def test_cypher_batch(self):
+        """test blocks encrypted in one flush and received as a batch"""
+        writer = FakeWriter()
+        sender = CypherProtocol(asyncio.StreamReader(), writer)
+        payloads = [b'first', b'second', b'third']
+        await sender.send_blocks(payloads)
+        self.assertEqual(1, len(writer.writes))
+        self.assertEqual(1, writer.drains)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(writer.writes[0])
+        reader.feed_eof()
+        receiver = CypherProtocol(reader, FakeWriter())
+        self.assertEqual(payloads[:2], await receiver.recv_blocks(2))
+        self.assertEqual(payloads[2:], await receiver.recv_blocks(2))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+"""test command line interface"""
+import os
+import subprocess
+import sys
+import unittest
+
+from click.testing import CliRunner
+
+from app.cli import cli
+
+
+class TestCli(unittest.TestCase):
+    """test CLI"""
+
+    def test_help(self):
+        """test help lists lazy commands"""
+        result = CliRunner().invoke(cli, ['--help'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('run-client  run client', result.output)
+        self.assertIn('run-server  run server', result.output)
+
+        result = CliRunner().invoke(cli, ['run-server', '--help'])
+        self.assertEqual(0, result.exit_code)
+
+    def test_lazy_imports(self):
+        """test `--help` / `--version` leave heavy modules unloaded"""
+        script = ('import sys\n'
+                  'from app.cli import cli\n'
+                  'try:\n'
+                  '    cli([sys.argv[1]])\n'
+                  'except SystemExit:\n'
+                  '    pass\n'
+                  'print(" ".join(sys.modules))\n')
+        for arg in ('--help', '--version'):
+            proc = subprocess.run([sys.executable, '-c', script, arg],
+                                  capture_output=True,
+                                  text=True,
+                                  check=True,
+                                  env=dict(os.environ,
+                                           PYTHONPATH=os.pathsep.join(
+                                               sys.path)))
+            modules = set(proc.stdout.split())
+            for module in ('asyncio', 'cryptography', 'app.serv'):
+                self.assertNotIn(module, modules)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,111 @@
+"""test load generator"""
+import asyncio
+import socket
+import unittest
+
+import click
+from click.testing import CliRunner
+
+from app.base_protocol import BaseTcpProtocol
+from app.client_server import ClientRemoteProtocol
+from app.loadgen import Distribution
+from app.loadgen import loadgen
+from app.loadgen import percentile
+from app.loadgen import run
+from app.loadgen import socks5_request
+from app.proxy_server import ProxyServerProtocol
+from tests import async_test
+
+
+class TestLoadgen(unittest.TestCase):
+    """test load generator"""
+
+    def test_distribution(self):
+        """test distribution specs"""
+        dist = Distribution()
+        self.assertEqual(42, dist.convert('42', None, None)())
+        self.assertEqual(42, dist.convert('const:42', None, None)())
+        sample = dist.convert('uniform:1:2', None, None)
+        self.assertTrue(all(1 <= sample() <= 2 for _ in range(100)))
+        self.assertGreater(dist.convert('expo:5', None, None)(), 0)
+        self.assertGreater(dist.convert('lognormal:1:1', None, None)(), 0)
+        for spec in ('normal:1:2', 'uniform:1', 'expo:x', 'expo:0'):
+            self.assertRaises(click.BadParameter,
+                              lambda s=spec: dist.convert(s, None, None))
+
+    def test_percentile(self):
+        """test nearest-rank percentile"""
+        values = list(range(100, 0, -1))
+        self.assertEqual(50, percentile(values, .5))
+        self.assertEqual(99, percentile(values, .99))
+        self.assertEqual(1, percentile(values, 0))
+        self.assertEqual(100, percentile(values, 1))
+        self.assertEqual(0, percentile([], .5))
+
+    def test_socks5_request(self):
+        """test SOCKS5 connect request"""
+        self.assertEqual(b'\x05\x01\x00\x01\x7f\x00\x00\x01\x1f\x90',
+                         socks5_request('127.0.0.1', 8080))
+        self.assertEqual(b'\x05\x01\x00\x03\x04host\x00\x50',
+                         socks5_request('host', 80))
+
+    def test_options(self):
+        """test options that would crash or hang the run are rejected"""
+        for args in (['-r', '0'], ['-c', '0'], ['-n', '0'],
+                     ['--interval', '-1'], ['--report-interval', '0']):
+            result = CliRunner().invoke(loadgen, args)
+            self.assertEqual(2, result.exit_code, args)
+
+    @async_test
+    async def test_run(self):
+        """test sessions through an in-process client and server"""
+
+        def handle_server(reader, writer):
+            local = ProxyServerProtocol(reader, writer)
+            asyncio.ensure_future(local.exchange_data())
+
+        async def handle_client(reader, writer):
+            local = BaseTcpProtocol(reader, writer)
+            remote = await ClientRemoteProtocol.create_connection(
+                '127.0.0.1', server_port)
+            asyncio.ensure_future(remote.exchange_data(local))
+
+        server = await asyncio.start_server(handle_server, '127.0.0.1', 0)
+        server_port = server.sockets[0].getsockname()[1]
+        client = await asyncio.start_server(handle_client, '127.0.0.1', 0)
+        client_port = client.sockets[0].getsockname()[1]
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            refused = closed.getsockname()[1]
+
+        async def load(proxy_port: int):
+            return await run(sessions=8,
+                             concurrency=4,
+                             rate=100,
+                             proxy=('127.0.0.1', proxy_port),
+                             echo_host='127.0.0.1',
+                             echo_port=0,
+                             report_interval=60,
+                             payload=lambda: 5000,
+                             duration=lambda: 0.05,
+                             interval=0.01,
+                             timeout=5)
+
+        try:
+            stats = await load(client_port)
+            self.assertEqual((8, 0, 8, 0),
+                             (stats.opened, stats.active, stats.succeeded,
+                              stats.failed))
+            self.assertEqual(8, len(stats.handshakes))
+            self.assertGreaterEqual(stats.transferred, 8 * 2 * 5000)
+
+            stats = await load(refused)
+            self.assertEqual((0, 8), (stats.succeeded, stats.failed))
+            self.assertEqual({'ConnectionRefusedError': 8}, stats.errors)
+        finally:
+            client.close()
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+"""test replay protection"""
+import asyncio
+import os
+import unittest
+from struct import pack
+from unittest import mock
+
+from app.proxy_server import ProxyServerProtocol
+from app.replay import BloomFilter
+from app.replay import ReplayFilter
+from app.sockopt import SocketProfile
+from tests import FakeWriter
+
+
+class TestReplay(unittest.TestCase):
+    """test replay filter"""
+
+    def test_bloom_filter(self):
+        """test Bloom filter"""
+        bloom = BloomFilter(capacity=1000, fp_rate=1e-3)
+        items = [os.urandom(12) for _ in range(1000)]
+        # inserts may hit false positives as well
+        false_positives = sum(bloom.add(item) for item in items)
+        self.assertLess(false_positives, 10)
+        self.assertEqual(1000, bloom.count + false_positives)
+        self.assertTrue(all(item in bloom for item in items))
+        self.assertTrue(bloom.add(items[0]))
+        false_positives = sum(os.urandom(12) in bloom for _ in range(10000))
+        self.assertLess(false_positives, 50)
+
+    def test_replay_filter(self):
+        """test replay filter rotation"""
+        replay = ReplayFilter(window=10, fp_rate=1e-3, max_bytes=1024)
+        nonce = os.urandom(12)
+        self.assertTrue(replay.check(nonce))
+        self.assertFalse(replay.check(nonce))
+
+        # still remembered by the previous generation after one rotation
+        with mock.patch('app.replay.time.monotonic',
+                        return_value=replay._since + 11):
+            self.assertFalse(replay.check(nonce))
+        # forgotten after two rotations
+        with mock.patch('app.replay.time.monotonic',
+                        return_value=replay._since + 11):
+            self.assertTrue(replay.check(nonce))
+
+        # rotate early on capacity, memory stays capped
+        with self.assertLogs('app.replay', 'WARNING'):
+            for _ in range(replay.capacity * 3):
+                replay.check(os.urandom(12))
+        self.assertLessEqual(replay._current.nbytes * 2, 1024)
+
+    def test_replayed_handshake(self):
+        """test a replayed handshake never reaches the upstream connect"""
+        ProxyServerProtocol._replay.clear()
+        cypher = ProxyServerProtocol._cypher
+        captured = (cypher.block_encrypt(pack('!BBB', 0x05, 0x01, 0x00)) +
+                    cypher.block_encrypt(
+                        pack('!BBBB4sH', 0x05, 0x01, 0x00, 0x01,
+                             b'\x7f\x00\x00\x01', 80)))
+
+        async def handshake():
+            reader = asyncio.StreamReader()
+            reader.feed_data(captured)
+            reader.feed_eof()
+            return await ProxyServerProtocol(reader,
+                                             FakeWriter()).handshake_socks5()
+
+        connect = mock.AsyncMock(side_effect=ConnectionRefusedError)
+        with mock.patch.object(SocketProfile, 'open_connection', connect):
+            self.assertIsNone(asyncio.run(handshake()))
+            self.assertEqual(1, connect.await_count)
+            # the same frames again
+            with self.assertLogs('app.base_protocol', 'WARNING'):
+                self.assertIsNone(asyncio.run(handshake()))
+            self.assertEqual(1, connect.await_count)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,118 @@
+"""test bandwidth shaping"""
+import asyncio
+import time
+import unittest
+
+from app.shaping import Shaper
+from app.shaping import TokenBucket
+
+
+class TestShaping(unittest.TestCase):
+    """test token buckets and shaper"""
+
+    def test_token_bucket(self):
+        """test token bucket"""
+        bucket = TokenBucket(rate=10000, burst=1000)
+        self.assertTrue(bucket.take(1000))
+        self.assertFalse(bucket.take(1000))
+
+        start = time.monotonic()
+        asyncio.run(bucket.consume(500))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+        unlimited = TokenBucket(rate=0, burst=0)
+        self.assertTrue(unlimited.take(10**9))
+        asyncio.run(unlimited.consume(10**9))
+
+    def test_shaper(self):
+        """test per-client buckets"""
+        shaper = Shaper(rate=10000,
+                        burst=1000,
+                        client_rate=10000,
+                        client_burst=1000,
+                        interactive_rate=100,
+                        interactive_burst=1000)
+        bulk = shaper.flow('10.0.0.1')
+        sibling = shaper.flow('10.0.0.1')
+        self.assertIs(bulk._client, sibling._client)
+        self.assertIsNot(bulk._client, shaper.flow('10.0.0.2')._client)
+
+        # the bulk stream exhausts its allowance, its client's bucket and the
+        # global bucket
+        asyncio.run(bulk.throttle(1000))
+        start = time.monotonic()
+        asyncio.run(bulk.throttle(2000))
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        start = time.monotonic()
+        asyncio.run(bulk.throttle(100))
+        self.assertGreaterEqual(time.monotonic() - start, 0.01)
+
+    def test_interactive_streams(self):
+        """test many interactive streams stay under their client's rate"""
+        shaper = Shaper(client_rate=10000,
+                        client_burst=1000,
+                        interactive_rate=10000,
+                        interactive_burst=1000)
+        sent = []
+
+        async def stream(deadline: float):
+            flow = shaper.flow('10.0.0.1')
+            while time.monotonic() < deadline:
+                await flow.throttle(100)
+                if time.monotonic() < deadline:
+                    sent.append(100)
+
+        async def run():
+            deadline = time.monotonic() + 0.5
+            await asyncio.gather(*(stream(deadline) for _ in range(200)))
+
+        asyncio.run(run())
+        # the rate over half a second plus both bursts
+        self.assertLess(sum(sent), 10000 * 0.5 + 2 * 1000)
+
+    def test_client_buckets(self):
+        """test client buckets outlive their flows until refilled"""
+        shaper = Shaper(client_rate=1000, client_burst=1000, max_clients=1)
+        first = shaper.flow('10.0.0.1')
+        asyncio.run(first._client.consume(2000, wait=False))
+        # reconnecting does not clear the debt
+        self.assertIs(first._client, shaper.flow('10.0.0.1')._client)
+        # an indebted bucket is kept even above the limit
+        shaper.flow('10.0.0.2')
+        self.assertIs(first._client, shaper.flow('10.0.0.1')._client)
+
+        first._client.tokens = first._client.burst
+        shaper.flow('10.0.0.3')
+        self.assertNotIn('10.0.0.1', shaper._clients)
+
+    def test_fairness(self):
+        """test bulk streams share bandwidth whatever their chunk size"""
+        shaper = Shaper(rate=1000000, burst=16 * 1024)
+        sent = {}
+
+        async def stream(chunk: int, deadline: float):
+            flow = shaper.flow('10.0.0.1')
+            sent[chunk] = 0
+            while time.monotonic() < deadline:
+                await flow.throttle(chunk)
+                sent[chunk] += chunk
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(stream(250 * 1000, start + 1),
+                                 stream(16 * 1000, start + 1))
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(run())
+        ratio = sent[250 * 1000] / sent[16 * 1000]
+        self.assertGreater(ratio, 0.5)
+        self.assertLess(ratio, 2)
+        # the global rate still holds, give or take the burst and the charges
+        # granted ahead of payment
+        self.assertLess(sum(sent.values()),
+                        1000000 * elapsed + 16 * 1024 + 250 * 1000)
+        self.assertGreater(sum(sent.values()), 900000)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
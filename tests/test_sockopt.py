@@ -0,0 +1,93 @@
+"""test socket options"""
+import asyncio
+import socket
+import unittest
+from unittest import mock
+
+from app.sockopt import SocketProfile
+from tests import async_test
+
+
+class TestSockopt(unittest.TestCase):
+    """test socket profile"""
+
+    def test_open_connection(self):
+        """test options on connected and listening sockets"""
+        prof = SocketProfile(nodelay=True,
+                             fastopen=16,
+                             keepalive=True,
+                             keepidle=30,
+                             rcvbuf=65536)
+        accepted = []
+
+        def handle(reader, writer):
+            prof.apply_writer(writer)
+            sock = writer.get_extra_info('socket')
+            accepted.append(
+                sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            writer.close()
+
+        async def run(fastopen: bool):
+            server = await asyncio.start_server(handle,
+                                                host='127.0.0.1',
+                                                port=0,
+                                                backlog=prof.backlog)
+            prof.apply_listener(server, fastopen=True)
+            port = server.sockets[0].getsockname()[1]
+            _, writer = await prof.open_connection('127.0.0.1',
+                                                   port,
+                                                   fastopen=fastopen)
+            writer.write(b'x')
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            sock = writer.get_extra_info('socket')
+            opts = (sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY),
+                    sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return opts
+
+        for fastopen in (False, True):
+            accepted.clear()
+            nodelay, keepalive = asyncio.run(run(fastopen))
+            self.assertTrue(nodelay)
+            self.assertTrue(keepalive)
+            self.assertEqual(1, len(accepted))
+            self.assertTrue(accepted[0])
+
+    @async_test
+    async def test_fastopen_fallback(self):
+        """test Fast Open tries every resolved address"""
+        prof = SocketProfile(fastopen=16)
+        server = await asyncio.start_server(lambda r, w: w.close(),
+                                            host='127.0.0.1',
+                                            port=0)
+        port = server.sockets[0].getsockname()[1]
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            refused = closed.getsockname()[1]
+
+        def info(p: int):
+            return (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP,
+                    '', ('127.0.0.1', p))
+
+        loop = asyncio.get_running_loop()
+        resolve = mock.AsyncMock(return_value=[info(refused), info(port)])
+        with mock.patch.object(loop, 'getaddrinfo', resolve):
+            _, writer = await prof.open_connection('localhost',
+                                                   port,
+                                                   fastopen=True)
+            self.assertEqual(port, writer.get_extra_info('peername')[1])
+            writer.close()
+
+        resolve = mock.AsyncMock(return_value=[info(refused)])
+        with mock.patch.object(loop, 'getaddrinfo', resolve):
+            with self.assertRaises(ConnectionRefusedError):
+                await prof.open_connection('localhost', port, fastopen=True)
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)